@@ -1,14 +1,10 @@
-import exifread
-
-from image_processing_pipeline.image_metadata import PhotoMetadata
+from image_processing_pipeline.image_metadata import read_photo_metadata
 from image_processing_pipeline.image_converter import ImageConverter
 
 # Extract metadata
-with open("pipeline_artifacts/raw/R0012110.DNG", mode="rb") as file:
-    tags = exifread.process_file(file)
-    metadata = PhotoMetadata.from_exif_tags(tags)
-    print("Metadata extracted:")
-    print(metadata)
+metadata = read_photo_metadata("pipeline_artifacts/raw/R0012110.DNG")
+print("Metadata extracted:")
+print(metadata)
 
 # Generate responsive image sizes
 converter = ImageConverter(output_quality=85, compression_effort=7)
@@ -1,13 +1,106 @@
 #!/usr/bin/env python3
 """CLI interface for processing photography and generating collections."""
 
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import click
-import exifread
+import yaml
 from pathlib import Path
 
-from image_processing_pipeline.image_metadata import PhotoMetadata
-from image_processing_pipeline.image_converter import ImageConverter
-from image_processing_pipeline.yaml_generator import YAMLGenerator
+# libvips reads this once at startup, so set it before anything imports
+# pyvips: keep intermediates for images up to 1 GB in RAM instead of
+# spilling to temporary files.
+os.environ.setdefault("VIPS_DISC_THRESHOLD", "1g")
+
+import pyvips
+
+from image_processing_pipeline.image_metadata import (
+    PhotoMetadata,
+    dump_json,
+    load_json,
+    read_photo_metadata,
+)
+from image_processing_pipeline.image_converter import DEFAULT_SIZES, ImageConverter
+from image_processing_pipeline.yaml_generator import (
+    YAMLDumper,
+    YAMLGenerator,
+    YAMLLoader,
+)
+
+# The libvips operation cache is process-wide; size it for a whole batch
+# run so loaders and repeated operations stay warm between photos.
+pyvips.cache_set_max(1000)
+pyvips.cache_set_max_mem(512 * 1024 * 1024)
+
+# Source formats picked up from pipeline_artifacts/raw
+RAW_EXTENSIONS = frozenset(
+    {"dng", "jpg", "jpeg", "png", "raw", "nef", "cr2", "arw", "rw2"}
+)
+THUMBNAIL_SUFFIX = "-thumbnail.avif"
+
+
+def _scan_raw_images(raw_path: Path) -> list[Path]:
+    """List source images in ``raw_path`` with a single directory read."""
+    try:
+        with os.scandir(raw_path) as entries:
+            return sorted(
+                Path(entry.path)
+                for entry in entries
+                if entry.name.rpartition(".")[2].lower() in RAW_EXTENSIONS
+                and entry.is_file()
+            )
+    except FileNotFoundError:
+        return []
+
+
+def _converted_stems(converted_path: Path) -> set[str]:
+    """Return stems that already have a thumbnail in ``converted_path``."""
+    try:
+        with os.scandir(converted_path) as entries:
+            return {
+                entry.name[: -len(THUMBNAIL_SUFFIX)]
+                for entry in entries
+                if entry.name.endswith(THUMBNAIL_SUFFIX)
+            }
+    except FileNotFoundError:
+        return set()
+
+
+def _init_worker() -> None:
+    """Run libvips single-threaded inside pool workers.
+
+    The pool already spreads files across cores; letting every worker
+    start a full-size libvips thread pool would oversubscribe the CPU.
+    """
+    pyvips.concurrency_set(1)
+
+
+def _process_one(
+    raw_file: Path,
+    converter: ImageConverter,
+    output_dir: Path,
+    sizes: dict[str, int],
+    force: bool = False,
+    cache_dir: str | None = None,
+) -> tuple[Path, PhotoMetadata]:
+    """Convert one raw image and save its metadata JSON (runs in a worker)."""
+    metadata = read_photo_metadata(raw_file, cache_dir=cache_dir)
+
+    converter.generate_responsive_sizes(
+        str(raw_file),
+        output_dir=str(output_dir),
+        output_format="avif",
+        sizes=sizes,
+        force=force,
+    )
+
+    # Save metadata JSON for later use
+    metadata_file = output_dir / f"{raw_file.stem}-metadata.json"
+    metadata_file.write_bytes(dump_json(metadata.to_json_dict()))
+
+    return raw_file, metadata
 
 
 @click.group()
@@ -61,7 +154,7 @@ def cli():
 @click.option(
     "--subsample-mode",
     default="auto",
-    help="Chroma subsampling mode (auto, on, off)",
+    help="Chroma subsampling mode (auto, on, off; off encodes with aom)",
     type=click.Choice(["auto", "on", "off"]),
 )
 @click.option(
@@ -74,6 +167,37 @@ def cli():
     default=True,
     help="Apply mild post-resize sharpening (default: on)",
 )
+@click.option(
+    "--encoder",
+    default="auto",
+    help=(
+        "AV1 encoder (auto: svt if libheif has it, else aom; svt is fastest"
+        " but 4:2:0 only, aom allows 12-bit output)"
+    ),
+    type=click.Choice(["auto", "svt", "aom", "rav1e"]),
+)
+@click.option(
+    "--bitdepth",
+    default="auto",
+    help="AVIF bit depth (auto: 8 for 8-bit sources, deeper for 16-bit)",
+    type=click.Choice(["8", "10", "12", "auto"]),
+)
+@click.option(
+    "--vips-threads",
+    default=None,
+    help="libvips worker threads (default: one per CPU core)",
+    type=click.IntRange(1),
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Re-encode images even if up-to-date outputs exist",
+)
+@click.option(
+    "--durable",
+    is_flag=True,
+    help="fsync every output file before moving it into place",
+)
 def process(
     input_path,
     output_dir,
@@ -86,71 +210,72 @@ def process(
     subsample_mode,
     strip_metadata,
     sharpen,
+    encoder,
+    bitdepth,
+    vips_threads,
+    force,
+    durable,
 ):
     """Process a raw image file and generate responsive sizes."""
+    if vips_threads is not None:
+        pyvips.concurrency_set(vips_threads)
+
     input_file = Path(input_path)
 
     if not input_file.exists():
         click.echo(f"Error: File not found: {input_path}", err=True)
         raise SystemExit(1)
 
+    try:
+        converter = ImageConverter(
+            output_quality=quality,
+            compression_effort=effort,
+            subsample_mode=subsample_mode,
+            strip_metadata=strip_metadata,
+            sharpen=sharpen,
+            encoder=encoder,
+            bitdepth=None if bitdepth == "auto" else int(bitdepth),
+            durable=durable,
+        )
+    except ValueError as e:
+        click.echo(f"Error: {e}", err=True)
+        raise SystemExit(1)
+
     click.echo(f"📸 Processing {input_file.name}...")
 
     # Extract metadata
-    with open(input_file, "rb") as f:
-        tags = exifread.process_file(f)
-        metadata = PhotoMetadata.from_exif_tags(tags)
+    metadata = read_photo_metadata(input_file)
 
     click.echo("✓ Metadata extracted")
     click.echo(f"  Camera: {metadata.camera_make} {metadata.camera_model}")
     click.echo(f"  Date: {metadata.date_taken}")
 
     # Generate responsive sizes
-    converter = ImageConverter(
-        output_quality=quality,
-        compression_effort=effort,
-        subsample_mode=subsample_mode,
-        strip_metadata=strip_metadata,
-        sharpen=sharpen,
-    )
     sizes = {
         "thumbnail": thumbnail_width,
         "collection": collection_width,
         "display": display_width,
     }
 
+    output_dir_path = Path(output_dir)
     output_files = converter.generate_responsive_sizes(
         str(input_file),
         output_dir=output_dir,
         output_format="avif",
         sizes=sizes,
         include_responsive_widths=responsive,
+        force=force,
     )
 
     click.echo("✓ Images generated:")
     for size_name, path in output_files.items():
-        size_bytes = Path(path).stat().st_size / 1024
-        click.echo(f"  {size_name:12} → {Path(path).name} ({size_bytes:.1f} KB)")
+        size_kb = os.stat(path).st_size / 1024
+        name = os.path.basename(path)
+        click.echo(f"  {size_name:12} → {name} ({size_kb:.1f} KB)")
 
     # Store metadata for later use
-    import json
-
-    metadata_file = Path(output_dir) / f"{input_file.stem}-metadata.json"
-    metadata_dict = {
-        "camera_make": str(metadata.camera_make or "Unknown"),
-        "camera_model": str(metadata.camera_model or "Unknown"),
-        "iso": metadata.iso,
-        "aperture": str(metadata.aperture) if metadata.aperture else None,
-        "shutter_speed": str(metadata.shutter_speed)
-        if metadata.shutter_speed
-        else None,
-        "focal_length_35mm": str(metadata.focal_length_35mm)
-        if metadata.focal_length_35mm
-        else None,
-        "date_taken": str(metadata.date_taken) if metadata.date_taken else None,
-    }
-    with open(metadata_file, "w") as f:
-        json.dump(metadata_dict, f, indent=2)
+    metadata_file = output_dir_path / f"{input_file.stem}-metadata.json"
+    metadata_file.write_bytes(dump_json(metadata.to_json_dict()))
     click.echo(f"✓ Metadata saved to {metadata_file}")
 
 
@@ -176,7 +301,14 @@ def process(
     default="/photos",
     help="Base URL for images (default: /photos, use full URL for R2)",
 )
-def generate_yaml(input_dir, collection_name, description, output_file, base_url):
+@click.option(
+    "--json-output",
+    is_flag=True,
+    help="Write the collection as JSON (still valid YAML, faster to write)",
+)
+def generate_yaml(
+    input_dir, collection_name, description, output_file, base_url, json_output
+):
     """Generate a YAML collection file from processed images."""
     input_path = Path(input_dir)
 
@@ -217,7 +349,7 @@ def generate_yaml(input_dir, collection_name, description, output_file, base_url
 
     # Generate YAML file
     yaml_file = generator.generate_collection(
-        collection_name, description, photos, output_file
+        collection_name, description, photos, output_file, json_output=json_output
     )
 
     click.echo(f"\n✓ Collection YAML generated: {yaml_file}")
@@ -233,20 +365,47 @@ def generate_yaml(input_dir, collection_name, description, output_file, base_url
     default=None,
     help="Add to existing collection (by filename)",
 )
-def quick_add(image_path, title, collection):
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Re-encode images even if up-to-date outputs exist",
+)
+@click.option(
+    "--encoder",
+    default="auto",
+    help=(
+        "AV1 encoder (auto: svt if libheif has it, else aom; svt is fastest"
+        " but 4:2:0 only, aom allows 12-bit output)"
+    ),
+    type=click.Choice(["auto", "svt", "aom", "rav1e"]),
+)
+@click.option(
+    "--bitdepth",
+    default="auto",
+    help="AVIF bit depth (auto: 8 for 8-bit sources, deeper for 16-bit)",
+    type=click.Choice(["8", "10", "12", "auto"]),
+)
+def quick_add(image_path, title, collection, force, encoder, bitdepth):
     """Quick add a single image to a collection."""
     input_file = Path(image_path)
+
+    try:
+        converter = ImageConverter(
+            encoder=encoder,
+            bitdepth=None if bitdepth == "auto" else int(bitdepth),
+        )
+    except ValueError as e:
+        click.echo(f"Error: {e}", err=True)
+        raise SystemExit(1)
+
     click.echo(f"📸 Processing {input_file.name}...")
 
     # Extract metadata
-    with open(input_file, "rb") as f:
-        tags = exifread.process_file(f)
-        metadata = PhotoMetadata.from_exif_tags(tags)
+    metadata = read_photo_metadata(input_file)
 
     click.echo(f"✓ Metadata extracted for: {title}")
 
     # Generate images
-    converter = ImageConverter()
     output_dir = Path("pipeline_artifacts/converted/")
     output_dir.mkdir(parents=True, exist_ok=True)
 
@@ -254,6 +413,7 @@ def quick_add(image_path, title, collection):
         str(input_file),
         output_dir=str(output_dir),
         output_format="avif",
+        force=force,
     )
 
     click.echo("✓ Images generated")
@@ -265,10 +425,10 @@ def quick_add(image_path, title, collection):
     )
 
     click.echo("\n✓ Photo entry created:")
-    click.echo(f"  ID: {photo_entry['id']}")
-    click.echo(f"  Title: {photo_entry['title']}")
-    click.echo(f"  Camera: {photo_entry['metadata']['camera']}")
-    click.echo(f"  Date: {photo_entry['metadata']['dateTaken']}")
+    click.echo(f"  ID: {photo_entry.id}")
+    click.echo(f"  Title: {photo_entry.title}")
+    click.echo(f"  Camera: {photo_entry.camera}")
+    click.echo(f"  Date: {photo_entry.date_taken}")
 
 
 @cli.command()
@@ -294,10 +454,39 @@ def quick_add(image_path, title, collection):
     help="Compression effort (1-6)",
     type=click.IntRange(1, 6),
 )
-def add_to_collection(collection, base_url, quality, effort):
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Re-encode images even if up-to-date outputs exist",
+)
+@click.option(
+    "--metadata-cache",
+    default=None,
+    help=(
+        "Directory caching parsed EXIF metadata between runs (off by default;"
+        " only raw files being re-encoded, e.g. with --force, read it)"
+    ),
+    type=click.Path(file_okay=False),
+)
+@click.option(
+    "--encoder",
+    default="auto",
+    help=(
+        "AV1 encoder (auto: svt if libheif has it, else aom; svt is fastest"
+        " but 4:2:0 only, aom allows 12-bit output)"
+    ),
+    type=click.Choice(["auto", "svt", "aom", "rav1e"]),
+)
+@click.option(
+    "--bitdepth",
+    default="auto",
+    help="AVIF bit depth (auto: 8 for 8-bit sources, deeper for 16-bit)",
+    type=click.Choice(["8", "10", "12", "auto"]),
+)
+def add_to_collection(
+    collection, base_url, quality, effort, force, metadata_cache, encoder, bitdepth
+):
     """Add new raw images to a collection (auto-processes if needed)."""
-    import yaml
-
     # Paths
     raw_path = Path("pipeline_artifacts/raw")
     converted_path = Path("pipeline_artifacts/converted")
@@ -308,91 +497,91 @@ def add_to_collection(collection, base_url, quality, effort):
         raise SystemExit(1)
 
     # Find raw images that haven't been converted yet
-    raw_images = sorted(raw_path.glob("*.[DdJjPpNnRr]*"))  # DNG, JPG, PNG, RAW, etc.
+    raw_images = _scan_raw_images(raw_path)
 
     if not raw_images:
         click.echo(f"Error: No raw images found in {raw_path}", err=True)
         raise SystemExit(1)
 
-    # Filter to only unconverted images
-    unconverted = []
-    for raw_file in raw_images:
-        stem = raw_file.stem
-        # Check if thumbnail version exists
-        if not (converted_path / f"{stem}-thumbnail.avif").exists():
-            unconverted.append(raw_file)
+    # Filter to only unconverted images (no thumbnail version yet)
+    converted_stems = _converted_stems(converted_path)
+    if force:
+        unconverted = raw_images
+    else:
+        unconverted = [f for f in raw_images if f.stem not in converted_stems]
+
+    # Metadata for images converted in this run, reused below
+    processed: dict[str, PhotoMetadata] = {}
 
     if unconverted:
         click.echo(f"Found {len(unconverted)} new image(s) to process")
         click.echo("Processing...")
 
-        converter = ImageConverter(output_quality=quality, compression_effort=effort)
-        for raw_file in unconverted:
-            with open(raw_file, "rb") as f:
-                tags = exifread.process_file(f)
-                metadata = PhotoMetadata.from_exif_tags(tags)
-
-            sizes = {
-                "thumbnail": 350,
-                "collection": 700,
-                "display": 1400,
-            }
-
-            output_files = converter.generate_responsive_sizes(
-                str(raw_file),
-                output_dir=str(converted_path),
-                output_format="avif",
-                sizes=sizes,
+        try:
+            converter = ImageConverter(
+                output_quality=quality,
+                compression_effort=effort,
+                encoder=encoder,
+                bitdepth=None if bitdepth == "auto" else int(bitdepth),
             )
-
-            # Save metadata JSON for later use
-            import json
-
-            metadata_file = converted_path / f"{raw_file.stem}-metadata.json"
-            metadata_dict = {
-                "camera_make": str(metadata.camera_make or "Unknown"),
-                "camera_model": str(metadata.camera_model or "Unknown"),
-                "iso": metadata.iso,
-                "aperture": str(metadata.aperture) if metadata.aperture else None,
-                "shutter_speed": str(metadata.shutter_speed)
-                if metadata.shutter_speed
-                else None,
-                "focal_length_35mm": str(metadata.focal_length_35mm)
-                if metadata.focal_length_35mm
-                else None,
-                "date_taken": str(metadata.date_taken) if metadata.date_taken else None,
-            }
-            with open(metadata_file, "w") as f:
-                json.dump(metadata_dict, f, indent=2)
-
-            click.echo(f"  ✓ {raw_file.name}")
+        except ValueError as e:
+            click.echo(f"Error: {e}", err=True)
+            raise SystemExit(1)
+        sizes = dict(DEFAULT_SIZES)
+
+        # Files are independent, and each one already encodes its sizes on
+        # parallel threads, so split the cores between the two levels.
+        max_workers = max(1, (os.cpu_count() or 1) // len(sizes))
+        # Spawn rather than fork: building the converter may already have
+        # started libvips threads (the encoder probe), and a forked child
+        # can inherit their locks held and hang.
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _process_one,
+                    raw_file,
+                    converter,
+                    converted_path,
+                    sizes,
+                    force,
+                    metadata_cache,
+                )
+                for raw_file in unconverted
+            ]
+            for future in as_completed(futures):
+                raw_file, metadata = future.result()
+                processed[raw_file.stem] = metadata
+                click.echo(f"  ✓ {raw_file.name}")
     else:
         click.echo("No new images to process")
 
     # Find new images (not already in collection)
-    avif_files = sorted(converted_path.glob("*-thumbnail.avif"))
+    converted_stems = sorted(converted_stems | processed.keys())
 
-    if not avif_files:
+    if not converted_stems:
         click.echo(f"Error: No images found in {converted_path}", err=True)
         raise SystemExit(1)
 
     # Load existing collection
     with open(collection_path, "r") as f:
-        collection_data = yaml.safe_load(f)
+        collection_data = yaml.load(f, Loader=YAMLLoader)
 
     existing_images = {photo["id"] for photo in collection_data.get("photos", [])}
     click.echo(f"\nCollection has {len(existing_images)} photos")
 
     # Find new images
     new_images = []
-    for thumbnail_file in avif_files:
-        base_name = thumbnail_file.stem.replace("-thumbnail", "")
+    for base_name in converted_stems:
         # Simple heuristic: if the image file isn't referenced, it's new
         if not any(
             base_name in photo.get("image", "")
             for photo in collection_data.get("photos", [])
         ):
-            new_images.append((base_name, thumbnail_file))
+            new_images.append(base_name)
 
     if not new_images:
         click.echo("✓ No new images to add")
@@ -416,39 +605,28 @@ def add_to_collection(collection, base_url, quality, effort):
     next_num = max(photo_num_ids, default=0) + 1
 
     # Process new images
-    for base_name, _ in new_images:
+    for base_name in new_images:
         click.echo(f"\n  {base_name}")
         title = click.prompt("    Title", default=base_name)
 
         photo_id = f"photo-{next_num:03d}"
-        metadata = PhotoMetadata()
-
-        # Try to load metadata from JSON
-        metadata_file = converted_path / f"{base_name}-metadata.json"
-        if metadata_file.exists():
-            import json
-
-            try:
-                with open(metadata_file, "r") as f:
-                    metadata_dict = json.load(f)
-                    # Populate metadata object from JSON
-                    metadata.camera_make = metadata_dict.get("camera_make")
-                    metadata.camera_model = metadata_dict.get("camera_model")
-                    # ISO comes as a list in JSON, extract first element
-                    iso_val = metadata_dict.get("iso")
-                    metadata.iso = (
-                        iso_val[0] if isinstance(iso_val, list) and iso_val else iso_val
+        metadata = processed.get(base_name)
+
+        # Images converted in an earlier run: load metadata from JSON
+        if metadata is None:
+            metadata = PhotoMetadata()
+            metadata_file = converted_path / f"{base_name}-metadata.json"
+            if metadata_file.exists():
+                try:
+                    metadata = PhotoMetadata.from_json_dict(
+                        load_json(metadata_file.read_bytes())
                     )
-                    metadata.aperture = metadata_dict.get("aperture")
-                    metadata.shutter_speed = metadata_dict.get("shutter_speed")
-                    metadata.focal_length_35mm = metadata_dict.get("focal_length_35mm")
-                    metadata.date_taken = metadata_dict.get("date_taken")
-                click.echo("    ✓ Metadata loaded")
-            except Exception as e:
-                click.echo(f"    ⚠ Could not load metadata: {e}")
+                    click.echo("    ✓ Metadata loaded")
+                except Exception as e:
+                    click.echo(f"    ⚠ Could not load metadata: {e}")
 
         photo_entry = generator.create_photo_entry(photo_id, title, metadata, base_name)
-        collection_data["photos"].append(photo_entry)
+        collection_data["photos"].append(photo_entry.to_dict())
         next_num += 1
 
     # Write updated collection
@@ -456,6 +634,7 @@ def add_to_collection(collection, base_url, quality, effort):
         yaml.dump(
             collection_data,
             f,
+            Dumper=YAMLDumper,
             default_flow_style=False,
             sort_keys=False,
             allow_unicode=True,
@@ -1,10 +1,89 @@
-import pyvips
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from functools import lru_cache
+from logging.handlers import BufferingHandler
 from pathlib import Path
 from typing import Optional
 
+import pyvips
+
+try:  # optional: faster half-size RAW demosaic (pip install ...[raw])
+    import rawpy
+except ImportError:
+    rawpy = None
+
+__all__ = ["DEFAULT_SIZES", "ENCODER_BITDEPTHS", "ImageConverter"]
+
+# Camera RAW formats that rawpy/libraw can demosaic
+RAW_SUFFIXES = frozenset({".dng", ".arw", ".nef", ".cr2", ".rw2"})
+
+# Size names and widths generated for every photo
+DEFAULT_SIZES: tuple[tuple[str, int], ...] = (
+    ("thumbnail", 350),
+    ("collection", 700),
+    ("display", 1400),
+)
+_DEFAULT_SIZES_DICT = dict(DEFAULT_SIZES)
+
+# AVIF bit depths each AV1 encoder can produce
+ENCODER_BITDEPTHS: dict[str, tuple[int, ...]] = {
+    "svt": (8, 10),
+    "aom": (8, 10, 12),
+    "rav1e": (8, 10, 12),
+}
+
+
+@lru_cache(maxsize=None)
+def _heifsave_selects_encoder() -> bool:
+    """Whether this libvips' heifsave has an ``encoder`` option (older ones don't)."""
+    try:
+        return "encoder" in pyvips.Introspect.get("heifsave").details
+    except Exception:
+        return False
+
+
+@lru_cache(maxsize=None)
+def _heif_encoder_available(encoder: str) -> bool:
+    """
+    Probe whether libheif was built with an AV1 encoder.
+
+    heifsave doesn't fail when the requested encoder is missing: it logs a
+    warning and uses another one.  So save a tiny image and look for that
+    warning on the pyvips logger.
+    """
+    if not _heifsave_selects_encoder():
+        return False
+
+    logger = logging.getLogger("pyvips")
+    handler = BufferingHandler(capacity=64)
+    level, propagate = logger.level, logger.propagate
+    logger.addHandler(handler)
+    logger.setLevel(logging.WARNING)
+    logger.propagate = False  # keep the probe's warning off the console
+    try:
+        pyvips.Image.black(64, 64, bands=3).heifsave_buffer(
+            compression="av1", encoder=encoder, effort=0
+        )
+    except pyvips.Error:
+        return False
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+        logger.propagate = propagate
+    return not any(
+        f"could not find {encoder}" in record.getMessage() for record in handler.buffer
+    )
+
 
 class ImageConverter:
-    """Convert images to different formats with configurable quality settings."""
+    """
+    Convert images to different formats with configurable quality settings.
+
+    Batch callers should create one converter and reuse it for every photo
+    so the settings, and libvips' process-wide caches, are shared.
+    """
 
     def __init__(
         self,
@@ -13,6 +92,9 @@ class ImageConverter:
         subsample_mode: str = "auto",
         strip_metadata: bool = True,
         sharpen: bool = True,
+        encoder: str = "auto",
+        bitdepth: int | None = None,
+        durable: bool = False,
     ):
         """
         Initialize converter with quality and compression settings.
@@ -23,31 +105,75 @@ class ImageConverter:
                 Higher values produce better compression at the cost of
                 encoding speed — ideal for offline pipelines.
             subsample_mode: Chroma subsampling mode ("auto", "on", "off").
-                "off" preserves full chroma for display images.
+                "off" preserves full chroma for display images; SVT-AV1
+                only encodes 4:2:0, so "off" switches it to "aom".
             strip_metadata: If True, strip all metadata except ICC profile
                 for color accuracy.  EXIF is extracted separately.
             sharpen: If True, apply a mild sharpen after resize to recover
                 detail lost during downsampling.
+            encoder: AV1 encoder used by libheif ("auto", "svt", "aom",
+                "rav1e").  SVT-AV1 is several times faster than libaom for
+                stills; "auto" uses it when libheif was built with it and
+                "aom" otherwise.  "aom" also allows 12-bit and 4:4:4 output.
+            bitdepth: AVIF bit depth (8, 10 or 12). None picks it from the
+                decoded image: 8-bit sources are encoded at 8 bits, deeper
+                ones at the most the encoder supports.
+            durable: If True, fsync each output before it replaces the
+                final path, and its directory after, so finished files
+                survive a crash or power loss.
+
+        Raises:
+            ValueError: If ``encoder`` isn't available, or can't produce
+                ``bitdepth``
         """
         self.output_quality = output_quality
         self.compression_effort = compression_effort
+        if encoder == "auto":
+            # SVT-AV1 has no 4:4:4 support, so don't probe for it then
+            use_svt = subsample_mode != "off" and _heif_encoder_available("svt")
+            encoder = "svt" if use_svt else "aom"
+        elif subsample_mode == "off" and encoder == "svt":
+            # SVT-AV1 has no 4:4:4 support; libheif would reject or ignore it
+            encoder = "aom"
+        elif _heifsave_selects_encoder() and not _heif_encoder_available(encoder):
+            raise ValueError(f"The {encoder} encoder is not available in libheif")
+        supported = ENCODER_BITDEPTHS.get(encoder)
+        if bitdepth is not None and supported and bitdepth not in supported:
+            raise ValueError(
+                f"The {encoder} encoder cannot write {bitdepth}-bit AVIF"
+                f" (supported: {', '.join(map(str, supported))})"
+            )
+
         self.subsample_mode = subsample_mode
         self.strip_metadata = strip_metadata
         self.sharpen = sharpen
+        self.encoder = encoder
+        self.bitdepth = bitdepth
+        self.durable = durable
 
     def _save_options(self, **overrides) -> dict:
         """Build common AVIF save keyword arguments."""
         opts: dict = {
             "Q": self.output_quality,
             "effort": self.compression_effort,
-            "bitdepth": 12,
             "subsample_mode": self.subsample_mode,
         }
+        if _heifsave_selects_encoder():
+            opts["encoder"] = self.encoder
         if self.strip_metadata:
             opts["keep"] = "icc"  # retain ICC profile for colour accuracy
         opts.update(overrides)
         return opts
 
+    def _bitdepth_for(self, image: pyvips.Image) -> int:
+        """Pick the AVIF bit depth for an image about to be encoded."""
+        if self.bitdepth is not None:
+            return self.bitdepth
+        if image.format == "uchar":
+            return 8
+        # 16-bit sources keep their shadow detail; SVT-AV1 tops out at 10
+        return max(ENCODER_BITDEPTHS.get(self.encoder, (12,)))
+
     def convert(
         self, photo: str, output_path: str | None = None, output_format: str = "avif"
     ) -> str:
@@ -76,8 +202,7 @@ class ImageConverter:
 
         try:
             image = pyvips.Image.new_from_file(str(input_path), access="sequential")
-            image.write_to_file(str(output_path), **self._save_options())
-            return str(output_path)
+            return self._write(image, str(output_path))
         except Exception as e:
             raise IOError(f"Failed to convert image {photo}: {str(e)}") from e
 
@@ -117,19 +242,95 @@ class ImageConverter:
             # thumbnail() uses shrink-on-load (decodes at reduced resolution)
             # and resizes with a high-quality lanczos3 kernel in one step,
             # producing sharper results than load-then-resize.
-            image = pyvips.Image.thumbnail(str(input_path), width)
-
-            # Mild unsharp-mask to recover perceived detail lost in
-            # downsampling.  sigma=1.0 keeps the effect subtle;
-            # m1=0 avoids sharpening flat/smooth areas (sky, skin).
-            if self.sharpen:
-                image = image.sharpen(sigma=1.0, x1=1.5, y2=5, y3=10, m1=0, m2=2)
-
-            image.write_to_file(str(output_path), **self._save_options())
-            return str(output_path)
+            # size="down" never upscales sources smaller than the target.
+            image = pyvips.Image.thumbnail(str(input_path), width, size="down")
+            return self._encode(image, str(output_path))
         except Exception as e:
             raise IOError(f"Failed to resize image {photo}: {str(e)}") from e
 
+    def _load_source(self, photo: str, width: int) -> pyvips.Image:
+        """Decode an image once at the largest width it will be needed."""
+        if rawpy is not None and Path(photo).suffix.lower() in RAW_SUFFIXES:
+            image = self._load_raw_half_size(photo, width)
+            if image is not None:
+                return image
+
+        # copy_memory() renders the decoded pixels so every later resize
+        # reuses them instead of re-running the (expensive RAW) decode.
+        return pyvips.Image.thumbnail(photo, width, size="down").copy_memory()
+
+    def _load_raw_half_size(self, photo: str, width: int) -> pyvips.Image | None:
+        """
+        Demosaic a RAW file at half resolution if that still covers ``width``.
+
+        libraw's half-size mode skips interpolation entirely and is roughly
+        four times faster than a full demosaic.  Returns None when the
+        largest output needs more than half the sensor resolution, or when
+        libraw can't handle the file, so the caller falls back to libvips.
+        """
+        try:
+            with rawpy.RawPy() as raw:
+                # open_file only parses the header, so sizes are known
+                # before any sensor data is unpacked
+                raw.open_file(photo)
+                if width > max(raw.sizes.width, raw.sizes.height) // 2:
+                    return None
+                rgb = raw.postprocess(
+                    half_size=True,
+                    use_camera_wb=True,
+                    no_auto_bright=True,
+                    output_bps=16,
+                )
+        except Exception:
+            return None
+
+        image = pyvips.Image.new_from_array(rgb, interpretation="rgb16")
+        return image.thumbnail_image(width, size="down").copy_memory()
+
+    def _encode(self, image: pyvips.Image, output_path: str) -> str:
+        """Sharpen (if enabled) and encode an already-resized image."""
+        # Mild unsharp-mask to recover perceived detail lost in
+        # downsampling.  sigma=1.0 keeps the effect subtle;
+        # m1=0 avoids sharpening flat/smooth areas (sky, skin).
+        if self.sharpen:
+            image = image.sharpen(sigma=1.0, x1=1.5, y2=5, y3=10, m1=0, m2=2)
+
+        return self._write(image, output_path)
+
+    def _write(self, image: pyvips.Image, output_path: str) -> str:
+        """
+        Encode in memory, then atomically move the file into place.
+
+        Readers (and the up-to-date check) never see a half-written file,
+        and the file system gets one large write instead of many small ones.
+        """
+        data = image.write_to_buffer(
+            os.path.splitext(output_path)[1],
+            **self._save_options(bitdepth=self._bitdepth_for(image)),
+        )
+
+        tmp_path = f"{output_path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+                if self.durable:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            with suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+            raise
+
+        if self.durable:
+            # The rename itself is only on disk once the directory is
+            dir_fd = os.open(os.path.dirname(output_path) or ".", os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        return output_path
+
     def generate_responsive_sizes(
         self,
         photo: str,
@@ -137,6 +338,7 @@ class ImageConverter:
         output_format: str = "avif",
         sizes: Optional[dict[str, int]] = None,
         include_responsive_widths: bool = False,
+        force: bool = False,
     ) -> dict[str, str]:
         """
         Generate multiple responsive image sizes from a single source.
@@ -148,6 +350,8 @@ class ImageConverter:
             sizes: Dict of size names to widths. Defaults to:
                    {'thumbnail': 350, 'collection': 700, 'display': 1400}
             include_responsive_widths: If True, also generate 400w, 800w, 1600w variants
+            force: If True, re-encode sizes whose output is already newer
+                than the source image
 
         Returns:
             Dictionary mapping size names to output paths
@@ -157,39 +361,81 @@ class ImageConverter:
             IOError: If conversion fails
         """
         if sizes is None:
-            sizes = {"thumbnail": 350, "collection": 700, "display": 1400}
+            sizes = _DEFAULT_SIZES_DICT
 
         input_path = Path(photo)
-        if not input_path.exists():
-            raise FileNotFoundError(f"Input image not found: {photo}")
+        try:
+            source_mtime = input_path.stat().st_mtime
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Input image not found: {photo}") from None
 
         output_dir_path = Path(output_dir)
         output_dir_path.mkdir(parents=True, exist_ok=True)
 
-        results = {}
         stem = input_path.stem
+        targets = dict(sizes)
+
+        # Generate additional responsive widths for srcset
+        if include_responsive_widths:
+            targets.update({"400w": 400, "800w": 800, "1600w": 1600})
+
+        results = {}
+        pending = {}
+        for size_name, width in targets.items():
+            output_path = output_dir_path / f"{stem}-{size_name}.{output_format}"
+            if not force and _is_up_to_date(output_path, source_mtime):
+                results[size_name] = str(output_path)
+            else:
+                pending[size_name] = (width, str(output_path))
+
+        if not pending:
+            return results
+
+        try:
+            source = self._load_source(
+                str(input_path), max(width for width, _ in pending.values())
+            )
+        except Exception as e:
+            raise IOError(f"Failed to decode image {photo}: {str(e)}") from e
 
-        for size_name, width in sizes.items():
-            output_filename = f"{stem}-{size_name}.{output_format}"
-            output_path = str(output_dir_path / output_filename)
+        # Resample largest to smallest, each size from the previous one, so
+        # every step reads a smaller in-memory image than the last.
+        resized = {}
+        image = source
+        for size_name, (width, _) in sorted(
+            pending.items(), key=lambda item: item[1][0], reverse=True
+        ):
             try:
-                results[size_name] = self.resize_and_convert(
-                    photo, width, output_path, output_format
+                if max(image.width, image.height) > width:
+                    image = image.thumbnail_image(width, size="down").copy_memory()
+            except Exception as e:
+                raise IOError(f"Failed to resize {size_name} size: {str(e)}") from e
+            resized[size_name] = image
+
+        # Every variant is an independent encode.  pyvips releases the GIL
+        # while libvips works, so threads are enough to keep one AVIF
+        # encoder busy per core.
+        max_workers = min(len(pending), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                size_name: executor.submit(
+                    self._encode, resized[size_name], output_path
                 )
-            except IOError as e:
+                for size_name, (_, output_path) in pending.items()
+            }
+
+        for size_name, future in futures.items():
+            try:
+                results[size_name] = future.result()
+            except Exception as e:
                 raise IOError(f"Failed to generate {size_name} size: {str(e)}") from e
 
-        # Generate additional responsive widths for srcset
-        if include_responsive_widths:
-            responsive_sizes = {"400w": 400, "800w": 800, "1600w": 1600}
-            for width_label, width_px in responsive_sizes.items():
-                output_filename = f"{stem}-{width_label}.{output_format}"
-                output_path = str(output_dir_path / output_filename)
-                try:
-                    results[width_label] = self.resize_and_convert(
-                        photo, width_px, output_path, output_format
-                    )
-                except IOError as e:
-                    raise IOError(f"Failed to generate {width_label} size: {str(e)}") from e
-
-        return results
+        return {size_name: results[size_name] for size_name in targets}
+
+
+def _is_up_to_date(output_path: Path, source_mtime: float) -> bool:
+    """Check whether an output exists and is at least as new as its source."""
+    try:
+        return output_path.stat().st_mtime >= source_mtime
+    except FileNotFoundError:
+        return False
@@ -1,10 +1,95 @@
-from dataclasses import dataclass
+import os
+from contextlib import suppress
+from dataclasses import asdict, dataclass, fields
+from functools import lru_cache
+from hashlib import blake2b
+from operator import attrgetter
+from typing import ClassVar
 
+import exifread
 
-@dataclass
+try:  # several times faster than the stdlib for small dicts
+    import orjson
+except ImportError:
+    orjson = None
+
+try:  # optional: libexiv2 bindings, faster than exifread (pip install ...[exiv2])
+    import pyexiv2
+except ImportError:
+    pyexiv2 = None
+
+# PhotoMetadata field names and the exifread tag each is read from
+_EXIF_FIELD_MAP = (
+    ("camera_make", "Image Make"),
+    ("camera_model", "Image Model"),
+    ("lens", "EXIF LensModel"),
+    ("date_taken", "EXIF DateTimeOriginal"),
+    ("focal_length_35mm", "EXIF FocalLengthIn35mmFilm"),
+    ("aperture", "EXIF FNumber"),
+    ("shutter_speed", "EXIF ExposureTime"),
+    ("iso", "EXIF ISOSpeedRatings"),
+    ("exposure_mode", "EXIF ExposureMode"),
+    ("metering_mode", "EXIF MeteringMode"),
+    ("exposure_bias", "EXIF ExposureBiasValue"),
+    ("contrast", "EXIF Contrast"),
+    ("saturation", "EXIF Saturation"),
+    ("sharpness", "EXIF Sharpness"),
+)
+
+# EXIF tags read by PhotoMetadata.from_exif_tags
+REQUIRED_TAGS = frozenset(key for _, key in _EXIF_FIELD_MAP)
+
+# Stored in sidecars for a missing camera make or model
+_UNKNOWN = "Unknown"
+_UNKNOWN_KEYS = frozenset({"camera_make", "camera_model"})
+
+# Stores into a frozen dataclass's slots (see PhotoMetadata._fast_new)
+_setattr = object.__setattr__
+
+# The same fields under libexiv2's key names, for PhotoMetadata.from_pyexiv2
+_EXIV2_FIELD_MAP = (
+    ("camera_make", "Exif.Image.Make"),
+    ("camera_model", "Exif.Image.Model"),
+    ("lens", "Exif.Photo.LensModel"),
+    ("date_taken", "Exif.Photo.DateTimeOriginal"),
+    ("focal_length_35mm", "Exif.Photo.FocalLengthIn35mmFilm"),
+    ("aperture", "Exif.Photo.FNumber"),
+    ("shutter_speed", "Exif.Photo.ExposureTime"),
+    ("iso", "Exif.Photo.ISOSpeedRatings"),
+    ("exposure_mode", "Exif.Photo.ExposureMode"),
+    ("metering_mode", "Exif.Photo.MeteringMode"),
+    ("exposure_bias", "Exif.Photo.ExposureBiasValue"),
+    ("contrast", "Exif.Photo.Contrast"),
+    ("saturation", "Exif.Photo.Saturation"),
+    ("sharpness", "Exif.Photo.Sharpness"),
+)
+
+# Bump when parsing changes in a way the tag maps don't show (e.g. _scalar)
+_CACHE_VERSION = 1
+
+# Part of every metadata cache key: entries are only reused by the same
+# parser version, tag maps and EXIF reader
+_CACHE_SCHEMA = blake2b(
+    repr(
+        (
+            _CACHE_VERSION,
+            "pyexiv2" if pyexiv2 is not None else "exifread",
+            _EXIF_FIELD_MAP,
+            _EXIV2_FIELD_MAP,
+        )
+    ).encode(),
+    digest_size=8,
+).hexdigest()
+
+
+@dataclass(slots=True, frozen=True)
 class PhotoMetadata:
     """Store useful EXIF metadata for photography portfolio."""
 
+    # exifread tag names read by from_exif_tags, for callers that run
+    # their own EXIF reader and want to request only these
+    EXIF_KEYS: ClassVar[tuple[str, ...]] = tuple(key for _, key in _EXIF_FIELD_MAP)
+
     # Camera info
     camera_make: str | None = None
     camera_model: str | None = None
@@ -30,37 +115,238 @@ class PhotoMetadata:
     saturation: str | None = None
     sharpness: str | None = None
 
-    # Image resolution
-    image_width: str | None = None
-    image_height: str | None = None
-
     @classmethod
     def from_exif_tags(cls, tags: dict) -> "PhotoMetadata":
         """Extract metadata from exifread tag dictionary."""
+        kwargs = {}
+        for attr, key in _EXIF_FIELD_MAP:
+            tag = tags.get(key)
+            if tag is None:
+                continue
+            kwargs[attr] = _scalar(tag.values if hasattr(tag, "values") else str(tag))
+        return cls._fast_new(kwargs)
+
+    @classmethod
+    def from_pyexiv2(cls, meta: dict) -> "PhotoMetadata":
+        """Extract metadata from a ``pyexiv2.Image.read_exif()`` dictionary."""
+        kwargs = {}
+        for attr, key in _EXIV2_FIELD_MAP:
+            # Repeated tags come back as lists; unwrap them like exifread's
+            value = _scalar(meta.get(key))
+            if value is None:
+                continue
+            # libexiv2 returns every value as text; keep integers as ints
+            # like exifread does, and rationals ("14/5") as strings
+            if isinstance(value, str) and value.lstrip("-").isdigit():
+                value = int(value)
+            kwargs[attr] = value
+        return cls._fast_new(kwargs)
+
+    @classmethod
+    def _fast_new(cls, values: dict) -> "PhotoMetadata":
+        """
+        Build an instance without going through the generated ``__init__``.
+
+        Slots have no class-level defaults, so every field is stored, with
+        None (the default of every field) for those missing from ``values``.
+        Keys that are not field names are ignored.
+        """
+        obj = object.__new__(cls)
+        get = values.get
+        for name in _FIELD_NAMES:
+            _setattr(obj, name, get(name))  # frozen=True blocks obj.name = ...
+        return obj
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PhotoMetadata":
+        """Rebuild metadata from a ``to_dict`` mapping (e.g. a JSON sidecar)."""
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: _scalar(v) for k, v in data.items() if k in names})
+
+    def to_dict(self) -> dict:
+        """Return metadata as a JSON-serialisable dictionary."""
+        return asdict(self)
+
+    @classmethod
+    def from_json_dict(cls, data: dict) -> "PhotoMetadata":
+        """
+        Rebuild metadata from a ``-metadata.json`` sidecar.
+
+        Inverse of ``to_json_dict`` as far as photo entries are concerned:
+        the "Unknown" placeholders written for a missing make or model are
+        turned back into None, so an entry built from a sidecar matches one
+        built from the freshly parsed metadata.
+        """
+        return cls.from_dict(
+            {
+                key: None if value == _UNKNOWN and key in _UNKNOWN_KEYS else value
+                for key, value in data.items()
+            }
+        )
+
+    def to_json_dict(self) -> dict:
+        """Return the subset of metadata stored in ``-metadata.json`` sidecars."""
+        return {
+            "camera_make": str(self.camera_make or _UNKNOWN),
+            "camera_model": str(self.camera_model or _UNKNOWN),
+            "lens": _str_or_none(self.lens),
+            "iso": self.iso,
+            "aperture": _str_or_none(self.aperture),
+            "shutter_speed": _str_or_none(self.shutter_speed),
+            "focal_length_35mm": _str_or_none(self.focal_length_35mm),
+            "date_taken": _str_or_none(self.date_taken),
+        }
+
+
+_FIELD_NAMES = tuple(f.name for f in fields(PhotoMetadata))
+
+
+class PhotoMetadataBatch:
+    """
+    Metadata for many photos, stored column-wise (one list per field).
+
+    Batch consumers such as ``YAMLGenerator.batch_process_soa`` work on a
+    whole field at a time (format every aperture, then every shutter
+    speed) instead of walking one PhotoMetadata object after another.
+    """
+
+    __slots__ = ("columns",)
+
+    FIELD_NAMES: ClassVar[tuple[str, ...]] = _FIELD_NAMES
+
+    def __init__(self, columns: dict[str, list]):
+        """
+        Initialize from per-field columns of equal length.
+
+        Args:
+            columns: Mapping of PhotoMetadata field names to value lists
+        """
+        self.columns = columns
+
+    @classmethod
+    def from_records(cls, records) -> "PhotoMetadataBatch":
+        """Transpose an iterable of PhotoMetadata into columns."""
+        rows = list(map(attrgetter(*cls.FIELD_NAMES), records))
+        if not rows:
+            return cls({name: [] for name in cls.FIELD_NAMES})
+        return cls(dict(zip(cls.FIELD_NAMES, map(list, zip(*rows)))))
+
+    def __len__(self) -> int:
+        return len(self.columns[self.FIELD_NAMES[0]])
+
+    def __getitem__(self, name: str) -> list:
+        """Return the column for one PhotoMetadata field."""
+        return self.columns[name]
+
+    def records(self):
+        """Yield the batch back as PhotoMetadata objects."""
+        for values in zip(*(self.columns[name] for name in self.FIELD_NAMES)):
+            yield PhotoMetadata(*values)
+
+
+def _scalar(value):
+    """Unwrap single-value EXIF lists and stringify ratios for storage."""
+    if isinstance(value, list) and len(value) == 1:
+        value = value[0]
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return str(value)
+
+
+def _str_or_none(value) -> str | None:
+    """Stringify a metadata value, mapping empty values to None."""
+    return str(value) if value else None
+
+
+def dump_json(data) -> bytes:
+    """Serialise ``data`` as indented UTF-8 JSON, using orjson if installed."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+
+    import json
+
+    return json.dumps(data, indent=2, ensure_ascii=False).encode()
+
+
+def load_json(data: bytes):
+    """Parse JSON bytes, using orjson if installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+
+    import json
+
+    return json.loads(data)
+
+
+def read_photo_metadata(
+    photo: str | os.PathLike, cache_dir: str | os.PathLike | None = None
+) -> PhotoMetadata:
+    """
+    Read EXIF metadata from an image file, reusing earlier parses.
+
+    Args:
+        photo: Path to the image file
+        cache_dir: Directory for a persistent metadata cache.  Entries are
+            keyed by the file's path, modification time and size, so
+            re-runs over an unchanged image set skip EXIF parsing.  The key
+            also covers the parser version, the tag maps and which EXIF
+            reader is installed, so entries from another setup are
+            re-parsed rather than reused.
+
+    Returns:
+        PhotoMetadata for the image
+    """
+    stat = os.stat(photo)
+    path = os.fspath(photo)
+    if cache_dir is None:
+        return _read_photo_metadata(path, stat.st_mtime_ns, stat.st_size)
+
+    key = (
+        f"{_CACHE_SCHEMA}\0{os.path.abspath(path)}\0"
+        f"{stat.st_mtime_ns}\0{stat.st_size}"
+    )
+    digest = blake2b(key.encode(), digest_size=16).hexdigest()
+    cache_file = os.path.join(cache_dir, f"{digest}.json")
+    try:
+        with open(cache_file, "rb") as f:
+            return PhotoMetadata.from_dict(load_json(f.read()))
+    except (OSError, ValueError):
+        pass  # not cached yet, or an unreadable entry: parse again
+
+    metadata = _read_photo_metadata(path, stat.st_mtime_ns, stat.st_size)
+
+    # The cache is only an optimisation; never fail a read because of it
+    with suppress(OSError):
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(dump_json(metadata.to_dict()))
+        os.replace(tmp_file, cache_file)
+    return metadata
+
+
+@lru_cache(maxsize=256)
+def _read_photo_metadata(path: str, mtime_ns: int, size: int) -> PhotoMetadata:
+    """Parse EXIF tags; mtime and size are part of the key so edits re-read."""
+    if pyexiv2 is not None:
+        try:
+            with pyexiv2.Image(path) as image:
+                return PhotoMetadata.from_pyexiv2(image.read_exif())
+        except Exception:
+            # libexiv2 raises RuntimeError on files it can't parse, and
+            # UnicodeDecodeError on tags that aren't valid UTF-8; exifread
+            # may still manage either way
+            pass
 
-        def get_tag(key: str, default=None):
-            """Safely get tag value."""
-            if key in tags:
-                return (
-                    tags[key].values if hasattr(tags[key], "values") else str(tags[key])
-                )
-            return default
-
-        return cls(
-            camera_make=get_tag("Image Make"),
-            camera_model=get_tag("Image Model"),
-            lens=get_tag("EXIF LensModel"),
-            date_taken=get_tag("EXIF DateTimeOriginal"),
-            focal_length_35mm=get_tag("EXIF FocalLengthIn35mmFilm"),
-            aperture=get_tag("EXIF FNumber"),
-            shutter_speed=get_tag("EXIF ExposureTime"),
-            iso=get_tag("EXIF ISOSpeedRatings"),
-            exposure_mode=get_tag("EXIF ExposureMode"),
-            metering_mode=get_tag("EXIF MeteringMode"),
-            exposure_bias=get_tag("EXIF ExposureBiasValue"),
-            contrast=get_tag("EXIF Contrast"),
-            saturation=get_tag("EXIF Saturation"),
-            sharpness=get_tag("EXIF Sharpness"),
-            image_width=get_tag("EXIF SubIFD1 ImageWidth"),
-            image_height=get_tag("EXIF SubIFD1 ImageLength"),
+    with open(path, "rb") as f:
+        # details=False skips MakerNote decoding, the biggest block in RAW
+        # files, and the raw-image SubIFDs (so nothing is read from them).
+        # EXIF IFD entries are sorted by tag number, so nothing we read
+        # comes after LensModel.
+        tags = exifread.process_file(
+            f, details=False, extract_thumbnail=False, stop_tag="LensModel"
         )
+    # Keep only what we use so the rest of the parsed tags can be freed now
+    return PhotoMetadata.from_exif_tags(
+        {key: tags[key] for key in REQUIRED_TAGS if key in tags}
+    )
@@ -1,8 +1,200 @@
-import yaml
+import json
+import math
+import os
+import re
+import sys
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import suppress
+from functools import lru_cache, partial, wraps
 from pathlib import Path
-from typing import Optional
+from typing import NamedTuple, Optional
+
+import yaml
+
+from image_processing_pipeline.image_metadata import (
+    PhotoMetadata,
+    PhotoMetadataBatch,
+    dump_json,
+)
+
+try:  # libyaml-backed C loader/dumper, several times faster than pure Python
+    from yaml import CSafeDumper as YAMLDumper, CSafeLoader as YAMLLoader
+except ImportError:
+    from yaml import SafeDumper as YAMLDumper, SafeLoader as YAMLLoader
+
+# Strings made only of these characters can usually be written unquoted
+_PLAIN_SCALAR_RE = re.compile(r"[\w./+\-:,() ]+")
+# Characters JSON leaves raw that YAML treats as breaks or won't accept
+_NON_PRINTABLE_RE = re.compile("[\x7f-\x9f\u2028\u2029\ufeff\ufffe\uffff]")
+_RESOLVER = yaml.resolver.Resolver()
+_STR_TAG = "tag:yaml.org,2002:str"
+
+# Placeholders for missing metadata; interned so every entry shares them
+UNKNOWN = sys.intern("Unknown")
+UNKNOWN_LOCATION = sys.intern("Unknown Location")
+
+# Key order of a photo entry and its nested mappings, as built by
+# PhotoEntry.to_dict
+ENTRY_KEYS = ("id", "title", "image", "collection", "thumbnail", "metadata")
+METADATA_KEYS = ("camera", "lens", "settings", "location", "dateTaken")
+SETTINGS_KEYS = ("iso", "aperture", "shutter", "focalLength")
+
+# Buffer size for collection files, so large collections are written
+# with a handful of syscalls
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Smallest batch_process batch worth spreading over worker processes
+PARALLEL_BATCH_MIN = 64
+
+
+class PhotoEntry(NamedTuple):
+    """
+    One photo in a collection, flattened.
+
+    A single tuple per photo instead of three nested dicts; the YAML
+    writer emits it field by field, and ``to_dict`` gives the nested
+    mapping stored in collection files when one is needed.
+    """
+
+    id: str
+    title: str
+    image: str
+    collection: str
+    thumbnail: str
+    camera: str
+    lens: str
+    iso: int | str
+    aperture: str
+    shutter: str
+    focal_length: str
+    location: str
+    date_taken: str
+
+    def to_dict(self) -> dict:
+        """Return the entry in the nested collection-file layout."""
+        # Literal dicts with constant keys (ENTRY_KEYS, METADATA_KEYS,
+        # SETTINGS_KEYS) compile to a single presized build from prehashed
+        # keys, which is cheaper than dict(zip(keys, values)).
+        return {
+            "id": self.id,
+            "title": self.title,
+            "image": self.image,
+            "collection": self.collection,
+            "thumbnail": self.thumbnail,
+            "metadata": {
+                "camera": self.camera,
+                "lens": self.lens,
+                "settings": {
+                    "iso": [self.iso],
+                    "aperture": self.aperture,
+                    "shutter": self.shutter,
+                    "focalLength": self.focal_length,
+                },
+                "location": self.location,
+                "dateTaken": self.date_taken,
+            },
+        }
+
+
+# An EXIF number or rational, optionally bracketed: "28", "14/5", "[1/13]"
+_RATIONAL_RE = re.compile(r"\[?(-?\d+(?:\.\d+)?)(?:/(-?\d+(?:\.\d+)?))?\]?")
+
+
+def _to_float(value) -> float | None:
+    """Parse an EXIF number or rational, returning None if it isn't one."""
+    if isinstance(value, str):
+        match = _RATIONAL_RE.fullmatch(value)
+        if match is None:
+            return None
+        num, den = match.groups()
+        if den is None:
+            return float(num)
+        den = float(den)
+        return float(num) / den if den else None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _cached_formatter(func):
+    """
+    Cache a one-argument formatter by its raw input value.
+
+    EXIF values repeat across a shoot (same lens, aperture and shutter for a
+    whole burst).  Unhashable values such as multi-value EXIF lists can't be
+    cache keys, so those are formatted uncached.
+    """
+    cached = lru_cache(maxsize=4096)(func)
+
+    @wraps(func)
+    def wrapper(value):
+        try:
+            return cached(value)
+        except TypeError:  # unhashable value
+            return func(value)
+
+    return wrapper
 
-from image_processing_pipeline.image_metadata import PhotoMetadata
+
+@_cached_formatter
+def _format_aperture(aperture_value) -> str:
+    """Format aperture value to f/X.X format."""
+    aperture = _to_float(aperture_value)
+    if aperture is None:
+        return UNKNOWN
+    return f"f/{2 ** (aperture / 2):.1f}"  # APEX value to f-number
+
+
+@_cached_formatter
+def _format_shutter_speed(shutter_value) -> str:
+    """Format shutter speed to 1/X format."""
+    # "1/X" strings are already in display form
+    if isinstance(shutter_value, str) and shutter_value.strip("[]").startswith("1/"):
+        return shutter_value.strip("[]")
+    value = _to_float(shutter_value)
+    if not value:  # unparseable, or a zero exposure time
+        return UNKNOWN
+    return f"{int(value)}s" if value >= 1 else f"1/{int(1 / value)}"
+
+
+@_cached_formatter
+def _format_focal_length(focal_length) -> str:
+    """Format focal length."""
+    value = _to_float(focal_length)
+    if value is None:
+        return UNKNOWN
+    return f"{int(value)}mm"
+
+
+# Defaults for missing metadata, shared by create_photo_entry and
+# batch_process_soa so both build identical entries
+def _format_camera(camera_make, camera_model) -> str:
+    """Join camera make and model, normalising whitespace."""
+    camera_make = str(camera_make or "").strip()
+    camera_model = str(camera_model or "").strip()
+    return f"{camera_make} {camera_model}".strip() or UNKNOWN
+
+
+def _format_lens(lens) -> str:
+    """Return the lens name, or UNKNOWN."""
+    return lens or UNKNOWN
+
+
+def _format_iso(iso) -> int | str:
+    """Return the ISO value, or 0 if missing."""
+    return iso or 0
+
+
+def _format_location(location) -> str:
+    """Return the location, or UNKNOWN_LOCATION."""
+    return location or UNKNOWN_LOCATION
+
+
+def _format_date_taken(date_taken) -> str:
+    """Return the capture date; PhotoMetadata stores dates as strings already."""
+    return date_taken or ""
 
 
 class YAMLGenerator:
@@ -26,79 +218,18 @@ class YAMLGenerator:
         self.metadata_dir = Path(metadata_dir)
         self.images_dir = Path(images_dir)
         self.base_url = base_url.rstrip("/")  # Remove trailing slash
+        self._collections_dir = os.path.join("src", "data", "collections")
+        self._collections_dir_ready = False
 
-    def _format_aperture(self, aperture_value) -> str:
-        """Format aperture value to f/X.X format."""
-        try:
-            if aperture_value is None:
-                return "Unknown"
-
-            # Handle string representations like "[14/5]"
-            if isinstance(aperture_value, str):
-                aperture_value = aperture_value.strip("[]")
-                if "/" in aperture_value:
-                    parts = aperture_value.split("/")
-                    aperture = float(parts[0]) / float(parts[1])
-                else:
-                    aperture = float(aperture_value)
-            else:
-                aperture = float(aperture_value)
-
-            # Convert to f-number
-            f_number = 2 ** (aperture / 2)
-            return f"f/{f_number:.1f}"
-        except (ValueError, TypeError, AttributeError, ZeroDivisionError):
-            return "Unknown"
-
-    def _format_shutter_speed(self, shutter_value) -> str:
-        """Format shutter speed to 1/X format."""
-        try:
-            if shutter_value is None:
-                return "Unknown"
-
-            # Handle string representations like "[1/13]"
-            if isinstance(shutter_value, str):
-                shutter_value = shutter_value.strip("[]")
-                if shutter_value.startswith("1/"):
-                    return shutter_value
-                elif "/" in shutter_value:
-                    parts = shutter_value.split("/")
-                    value = float(parts[0]) / float(parts[1])
-                else:
-                    value = float(shutter_value)
-            else:
-                value = float(shutter_value)
-
-            if value >= 1:
-                return f"{int(value)}s"
-            else:
-                return f"1/{int(1 / value)}"
-        except (ValueError, TypeError, AttributeError, ZeroDivisionError):
-            return "Unknown"
-
-    def _format_focal_length(self, focal_length) -> str:
-        """Format focal length."""
-        try:
-            if focal_length is None:
-                return "Unknown"
-
-            # Handle string representations like "[28]"
-            if isinstance(focal_length, str):
-                focal_length = focal_length.strip("[]")
-                if "/" in focal_length:
-                    parts = focal_length.split("/")
-                    value = float(parts[0]) / float(parts[1])
-                else:
-                    value = float(focal_length)
-            else:
-                value = float(focal_length)
-            return f"{int(value)}mm"
-        except (ValueError, TypeError, AttributeError, ZeroDivisionError):
-            return "Unknown"
+        # Bound str.format per variant, so each URL is one C-level call
+        url_prefix = self.base_url.replace("{", "{{").replace("}", "}}")
+        self._display_url = (url_prefix + "/{}-display.avif").format
+        self._collection_url = (url_prefix + "/{}-collection.avif").format
+        self._thumbnail_url = (url_prefix + "/{}-thumbnail.avif").format
 
     def create_photo_entry(
         self, photo_id: str, title: str, metadata: PhotoMetadata, image_stem: str
-    ) -> dict:
+    ) -> PhotoEntry:
         """
         Create a photo entry for YAML.
 
@@ -109,40 +240,34 @@ class YAMLGenerator:
             image_stem: Base filename of the image (without extension)
 
         Returns:
-            Dictionary representing the photo entry
+            PhotoEntry for the photo (``to_dict()`` gives the YAML mapping)
         """
-        # Normalize camera strings
-        camera_make = str(metadata.camera_make or "").strip()
-        camera_model = str(metadata.camera_model or "").strip()
+        m = metadata
 
-        return {
-            "id": photo_id,
-            "title": title,
-            "image": f"{self.base_url}/{image_stem}-display.avif",
-            "collection": f"{self.base_url}/{image_stem}-collection.avif",
-            "thumbnail": f"{self.base_url}/{image_stem}-thumbnail.avif",
-            "metadata": {
-                "camera": f"{camera_make} {camera_model}".strip() or "Unknown",
-                "lens": metadata.lens or "Unknown",
-                "settings": {
-                    "iso": [metadata.iso] if metadata.iso else [0],
-                    "aperture": self._format_aperture(metadata.aperture),
-                    "shutter": self._format_shutter_speed(metadata.shutter_speed),
-                    "focalLength": self._format_focal_length(
-                        metadata.focal_length_35mm
-                    ),
-                },
-                "location": metadata.location or "Unknown Location",
-                "dateTaken": str(metadata.date_taken or ""),
-            },
-        }
+        return PhotoEntry(
+            photo_id,
+            title,
+            self._display_url(image_stem),
+            self._collection_url(image_stem),
+            self._thumbnail_url(image_stem),
+            _format_camera(m.camera_make, m.camera_model),
+            _format_lens(m.lens),
+            _format_iso(m.iso),
+            _format_aperture(m.aperture),
+            _format_shutter_speed(m.shutter_speed),
+            _format_focal_length(m.focal_length_35mm),
+            _format_location(m.location),
+            _format_date_taken(m.date_taken),
+        )
 
     def generate_collection(
         self,
         collection_name: str,
         description: str,
-        photos: list[dict],
+        photos: list[PhotoEntry | dict],
         output_file: Optional[str] = None,
+        fast_dump: bool = True,
+        json_output: bool = False,
     ) -> str:
         """
         Generate a collection YAML file.
@@ -150,8 +275,15 @@ class YAMLGenerator:
         Args:
             collection_name: Name of the collection
             description: Collection description
-            photos: List of photo entry dictionaries
+            photos: List of PhotoEntry tuples or photo entry dictionaries
             output_file: Output file path. If None, saves to src/data/collections/{collection_name}.yaml
+            fast_dump: If True, write the YAML with the built-in block writer
+                instead of PyYAML.  Data it cannot represent still goes
+                through PyYAML.
+            json_output: If True, write the collection as indented JSON.
+                YAML is a superset of JSON, so the ``.yaml`` file still
+                loads with any YAML parser; it is just less pleasant to
+                edit by hand.
 
         Returns:
             Path to the generated YAML file
@@ -162,32 +294,116 @@ class YAMLGenerator:
             "photos": photos,
         }
 
-        if output_file is None:
-            collections_dir = Path("src/data/collections")
-            collections_dir.mkdir(parents=True, exist_ok=True)
-            output_file = str(
-                collections_dir / f"{collection_name.lower().replace(' ', '-')}.yaml"
-            )
+        output_path = self._output_path(collection_name, output_file)
 
-        output_path = Path(output_file)
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+        # Every path renders the whole file in memory first, then hands it
+        # to the OS in a single write
+        data = None
+        if json_output:
+            # orjson (when installed) encodes UTF-8 natively in one pass
+            data = dump_json(_as_mapping(collection_data)) + b"\n"
+        elif fast_dump:
+            try:
+                data = _dump_collection_yaml(collection_data).encode()
+            except TypeError:
+                pass  # a value the fast writer can't represent; use PyYAML
 
-        with open(output_path, "w") as f:
-            yaml.dump(
-                collection_data,
-                f,
+        if data is None:
+            data = yaml.dump(
+                _as_mapping(collection_data),
+                Dumper=YAMLDumper,
                 default_flow_style=False,
                 sort_keys=False,
                 allow_unicode=True,
+                encoding="utf-8",
             )
 
+        with open(output_path, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+            f.write(data)
+
+        return str(output_path)
+
+    def generate_collection_streaming(
+        self,
+        collection_name: str,
+        description: str,
+        photo_iter: Iterable[PhotoEntry | dict],
+        output_file: Optional[str] = None,
+    ) -> str:
+        """
+        Generate a collection YAML file, writing photos as they are produced.
+
+        Unlike ``generate_collection`` this never holds the full photo list:
+        each entry is written as soon as ``photo_iter`` yields it.  The
+        output is identical to ``generate_collection`` with ``fast_dump``,
+        except that an entry the block writer can't represent is written
+        by PyYAML on its own rather than the whole file.
+
+        Photos are streamed into a temporary file next to the output, which
+        only replaces it once every entry has been written.  If building an
+        entry fails, the existing collection file is left untouched.
+
+        Args:
+            collection_name: Name of the collection
+            description: Collection description
+            photo_iter: Iterable of PhotoEntry tuples or photo entry dictionaries
+            output_file: Output file path. If None, saves to src/data/collections/{collection_name}.yaml
+
+        Returns:
+            Path to the generated YAML file
+        """
+        output_path = self._output_path(collection_name, output_file)
+
+        tmp_path = f"{output_path}.tmp"
+        try:
+            # Entries arrive one line at a time; a large buffer turns those
+            # into a few big writes
+            with open(
+                tmp_path, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE
+            ) as f:
+                write = f.write
+                _write_collection_yaml(
+                    {"collection": collection_name, "description": description},
+                    write,
+                )
+                photos = iter(photo_iter)
+                first = next(photos, None)
+                if first is None:
+                    write("photos: []\n")
+                else:
+                    write("photos:\n")
+                    write(_render_photo_item(first))
+                    for photo in photos:
+                        write(_render_photo_item(photo))
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            with suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+            raise
+
         return str(output_path)
 
+    def _output_path(self, collection_name: str, output_file: Optional[str]) -> str:
+        """Resolve (and create the directory for) a collection's YAML file."""
+        if output_file is None:
+            # The default directory only needs creating once per generator
+            if not self._collections_dir_ready:
+                os.makedirs(self._collections_dir, exist_ok=True)
+                self._collections_dir_ready = True
+            slug = collection_name.lower().replace(" ", "-")
+            return os.path.join(self._collections_dir, f"{slug}.yaml")
+
+        output_dir = os.path.dirname(output_file)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        return output_file
+
     def batch_process(
         self,
         collection_name: str,
         collection_description: str,
         images: list[tuple[str, str, PhotoMetadata]],  # (id, title, metadata)
+        workers: Optional[int] = None,
     ) -> str:
         """
         Process multiple images and create a collection file.
@@ -196,15 +412,240 @@ class YAMLGenerator:
             collection_name: Name of the collection
             collection_description: Collection description
             images: List of (photo_id, title, metadata) tuples
+            workers: Build entries in this many worker processes for batches
+                over ``PARALLEL_BATCH_MIN`` images.  Off by default: an
+                entry takes microseconds to build, so shipping it between
+                processes usually costs more than it saves.
+
+        Returns:
+            Path to the generated YAML file
+        """
+        build = partial(_build_entry, self)
+        if workers is not None and workers > 1 and len(images) > PARALLEL_BATCH_MIN:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # map() yields in input order, so entries stream straight out
+                return self.generate_collection_streaming(
+                    collection_name,
+                    collection_description,
+                    executor.map(build, images, chunksize=32),
+                )
+
+        # Entries are built lazily and written one at a time
+        return self.generate_collection_streaming(
+            collection_name, collection_description, map(build, images)
+        )
+
+    def batch_process_soa(
+        self,
+        collection_name: str,
+        collection_description: str,
+        photo_ids: list[str],
+        titles: list[str],
+        batch: PhotoMetadataBatch,
+    ) -> str:
+        """
+        Create a collection file from column-wise metadata.
+
+        Produces the same file as ``batch_process`` but formats each
+        metadata field across the whole batch in one pass, then zips the
+        columns into entries as they are written.
+
+        Args:
+            collection_name: Name of the collection
+            collection_description: Collection description
+            photo_ids: Photo identifiers, also used as image stems
+            titles: Photo titles, in the same order
+            batch: Metadata for the same photos, in the same order
 
         Returns:
             Path to the generated YAML file
         """
-        photos = []
-        for photo_id, title, metadata in images:
-            # Extract base filename from metadata date or use photo_id
-            image_stem = photo_id
-            photo_entry = self.create_photo_entry(photo_id, title, metadata, image_stem)
-            photos.append(photo_entry)
-
-        return self.generate_collection(collection_name, collection_description, photos)
+        cameras = list(map(_format_camera, batch["camera_make"], batch["camera_model"]))
+        lenses = list(map(_format_lens, batch["lens"]))
+        isos = list(map(_format_iso, batch["iso"]))
+        apertures = list(map(_format_aperture, batch["aperture"]))
+        shutters = list(map(_format_shutter_speed, batch["shutter_speed"]))
+        focals = list(map(_format_focal_length, batch["focal_length_35mm"]))
+        locations = list(map(_format_location, batch["location"]))
+        dates = list(map(_format_date_taken, batch["date_taken"]))
+
+        photo_iter = map(
+            PhotoEntry._make,
+            zip(
+                photo_ids,
+                titles,
+                map(self._display_url, photo_ids),
+                map(self._collection_url, photo_ids),
+                map(self._thumbnail_url, photo_ids),
+                cameras,
+                lenses,
+                isos,
+                apertures,
+                shutters,
+                focals,
+                locations,
+                dates,
+                strict=True,
+            ),
+        )
+        return self.generate_collection_streaming(
+            collection_name, collection_description, photo_iter
+        )
+
+
+def _build_entry(
+    generator: YAMLGenerator, image: tuple[str, str, PhotoMetadata]
+) -> PhotoEntry:
+    """Build one photo entry; module-level so process pools can pickle it."""
+    photo_id, title, metadata = image
+    # The image stem is the photo_id
+    return generator.create_photo_entry(photo_id, title, metadata, photo_id)
+
+
+def _dump_collection_yaml(collection_data: dict) -> str:
+    """Render a collection as block-style YAML without PyYAML's emitter."""
+    chunks: list[str] = []
+    _write_collection_yaml(collection_data, chunks.append)
+    return "".join(chunks)
+
+
+def _write_collection_yaml(data: dict, write, indent: int = 0, lead=None) -> None:
+    """
+    Write a mapping as block YAML, one ``write`` call per line.
+
+    Nested mappings and non-empty sequences become indented blocks, and
+    everything else goes through ``_yaml_scalar``.  ``lead`` replaces the
+    indentation of the first line; sequences use it to put the first key
+    after the ``- `` marker.
+
+    Raises:
+        TypeError: If a value has no plain YAML representation
+    """
+    pad = " " * indent
+    for key, value in data.items():
+        prefix = pad if lead is None else lead
+        lead = None
+        if isinstance(value, dict) and value:
+            write(f"{prefix}{_yaml_scalar(key)}:\n")
+            _write_collection_yaml(value, write, indent + 2)
+        elif isinstance(value, (list, tuple)) and value:
+            write(f"{prefix}{_yaml_scalar(key)}:\n")
+            _write_yaml_sequence(value, write, indent + 2)
+        else:
+            write(f"{prefix}{_yaml_scalar(key)}: {_yaml_scalar(value)}\n")
+
+
+def _write_yaml_sequence(items, write, indent: int, lead=None) -> None:
+    """Write a sequence as block YAML items at ``indent``."""
+    pad = " " * indent
+    for item in items:
+        prefix = (pad if lead is None else lead) + "- "
+        lead = None
+        if isinstance(item, PhotoEntry):
+            _write_photo_entry(item, write, indent + 2, lead=prefix)
+        elif isinstance(item, dict) and item:
+            _write_collection_yaml(item, write, indent + 2, lead=prefix)
+        elif isinstance(item, (list, tuple)) and item:
+            _write_yaml_sequence(item, write, indent + 2, lead=prefix)
+        else:
+            write(f"{prefix}{_yaml_scalar(item)}\n")
+
+
+def _write_photo_entry(entry: PhotoEntry, write, indent: int, lead: str) -> None:
+    """Write a PhotoEntry in the same layout as its ``to_dict()`` mapping."""
+    q = _yaml_scalar
+    pad = " " * indent
+    write(f"{lead}id: {q(entry.id)}\n")
+    write(f"{pad}title: {q(entry.title)}\n")
+    write(f"{pad}image: {q(entry.image)}\n")
+    write(f"{pad}collection: {q(entry.collection)}\n")
+    write(f"{pad}thumbnail: {q(entry.thumbnail)}\n")
+    write(f"{pad}metadata:\n")
+    write(f"{pad}  camera: {q(entry.camera)}\n")
+    write(f"{pad}  lens: {q(entry.lens)}\n")
+    write(f"{pad}  settings:\n")
+    write(f"{pad}    iso:\n")
+    write(f"{pad}      - {q(entry.iso)}\n")
+    write(f"{pad}    aperture: {q(entry.aperture)}\n")
+    write(f"{pad}    shutter: {q(entry.shutter)}\n")
+    write(f"{pad}    focalLength: {q(entry.focal_length)}\n")
+    write(f"{pad}  location: {q(entry.location)}\n")
+    write(f"{pad}  dateTaken: {q(entry.date_taken)}\n")
+
+
+def _render_photo_item(photo: PhotoEntry | dict) -> str:
+    """
+    Render one item of a collection's ``photos`` sequence.
+
+    Values the block writer can't represent are handed to PyYAML for this
+    entry only, indented to line up with the other items.
+    """
+    chunks: list[str] = []
+    try:
+        _write_yaml_sequence((photo,), chunks.append, 2)
+    except TypeError:
+        item = photo.to_dict() if isinstance(photo, PhotoEntry) else photo
+        text = yaml.dump(
+            [item],
+            Dumper=YAMLDumper,
+            default_flow_style=False,
+            sort_keys=False,
+            allow_unicode=True,
+        )
+        # Split on "\n" only (PyYAML's line break); blank lines stay blank
+        # so block scalars keep their content
+        return "".join(
+            f"  {line}\n" if line else "\n" for line in text[:-1].split("\n")
+        )
+    return "".join(chunks)
+
+
+def _as_mapping(collection_data: dict) -> dict:
+    """Replace PhotoEntry tuples with dicts for generic serialisers."""
+    return {
+        **collection_data,
+        "photos": [
+            photo.to_dict() if isinstance(photo, PhotoEntry) else photo
+            for photo in collection_data["photos"]
+        ],
+    }
+
+
+def _yaml_scalar(value) -> str:
+    """
+    Format a scalar so it loads back as the same value.
+
+    Strings are written bare when that is unambiguous and JSON-quoted
+    otherwise (a JSON string is a valid double-quoted YAML scalar).
+    """
+    if isinstance(value, str):
+        if (
+            _PLAIN_SCALAR_RE.fullmatch(value)
+            and value[0] not in " -:,"
+            and value[-1] not in " :"
+            and ": " not in value
+            and _RESOLVER.resolve(yaml.ScalarNode, value, (True, False)) == _STR_TAG
+        ):
+            return value
+        return _NON_PRINTABLE_RE.sub(
+            lambda m: f"\\u{ord(m[0]):04x}", json.dumps(value, ensure_ascii=False)
+        )
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return repr(value)
+    if isinstance(value, float):
+        if math.isnan(value):
+            return ".nan"
+        if math.isinf(value):
+            return ".inf" if value > 0 else "-.inf"
+        text = repr(value)
+        # YAML 1.1 floats need a dot before the exponent
+        return text if "." in text else text.replace("e", ".0e", 1)
+    if value == {}:
+        return "{}"
+    if value == [] or value == ():
+        return "[]"
+    raise TypeError(f"Cannot write {type(value).__name__} as a YAML scalar")